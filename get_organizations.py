@@ -1,10 +1,23 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
+import base64
 import time
 from dotenv import load_dotenv
-import json
+import orjson
 from datetime import datetime
 import threading
+import functools
+from types import MappingProxyType
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from apscheduler.schedulers.background import BackgroundScheduler
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock; always poll there
+    fcntl = None
 
 # Load environment variables
 load_dotenv()
@@ -13,140 +26,534 @@ load_dotenv()
 AUTH0_DOMAIN = os.getenv('AUTH0_DOMAIN')
 AUTH0_CLIENT_ID = os.getenv('AUTH0_CLIENT_ID')
 AUTH0_CLIENT_SECRET = os.getenv('AUTH0_CLIENT_SECRET')
+AUTH0_API_BASE = f"https://{AUTH0_DOMAIN}/api/v2"
 
 
 
 # Slack configuration
 SLACK_WEBHOOK_URL = os.getenv('SLACK_WEBHOOK_URL')
+# Slack message limits; larger batches are split across several messages
+SLACK_MAX_PAYLOAD_BYTES = 40_000
+SLACK_MAX_BLOCKS = 50
+SLACK_MAX_SECTION_CHARS = 3000
+# Bytes reserved for the payload's top-level fields around the blocks
+SLACK_PAYLOAD_OVERHEAD = 1024
 
 # File to store previously seen organizations
 PREVIOUS_ORGS_FILE = 'previous_orgs.json'
 
+# Polling interval in seconds; doubles after each empty poll up to the max
+POLL_INTERVAL = 60
+MAX_POLL_INTERVAL = 10 * 60
+# Polling interval in seconds after a failed poll
+ERROR_RETRY_INTERVAL = 5 * 60
+# Set RUN_POLLER=0 to serve the app without polling; otherwise one process
+# per host polls, chosen by an advisory lock on POLLER_LOCK_FILE
+RUN_POLLER = os.getenv('RUN_POLLER', '1') == '1'
+POLLER_LOCK_FILE = os.getenv('POLLER_LOCK_FILE', '/tmp/neworgs.lock')
+# Heartbeat the poller writes after each poll so every worker's /healthz can
+# report the poller's health
+HEARTBEAT_FILE = os.getenv('POLLER_HEARTBEAT_FILE', '/tmp/neworgs.heartbeat.json')
+# Seconds past the expected next poll (including one error retry) that a
+# successful poll may be late before /healthz fails
+HEALTHZ_GRACE_PERIOD = 2 * 60
+
+# GitHub profile URL cache, persisted across restarts
+GITHUB_CACHE_FILE = 'github_users.json'
+GITHUB_CACHE_TTL = 6 * 3600  # 6 hours in seconds
+GITHUB_CACHE_MAXSIZE = 10_000
+
+# Auth0 user_id prefix for GitHub social connections (format: "github|123456")
+GITHUB_USER_PREFIX = 'github|'
+
+# GitHub API configuration; a token lifts the rate limit from 60 to 5,000
+# requests/hour and enables batched GraphQL lookups
+GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
+GITHUB_API_BASE = 'https://api.github.com'
+GITHUB_HEADERS = {'Accept': 'application/vnd.github+json'}
+if GITHUB_TOKEN:
+    GITHUB_HEADERS['Authorization'] = f'Bearer {GITHUB_TOKEN}'
+GITHUB_GRAPHQL_BATCH_SIZE = 100  # GraphQL nodes() accepts at most 100 IDs
+GITHUB_USERS_QUERY = 'query($ids: [ID!]!) { nodes(ids: $ids) { ... on User { databaseId login url } } }'
+
+# (connect, read) timeouts in seconds for every HTTP call, so a stalled
+# endpoint fails fast instead of hanging the poller
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Shared HTTP session so Auth0 and GitHub connections are kept alive
+# and reused across polls instead of doing a TLS handshake per request
+SESSION = requests.Session()
+SESSION.headers['Content-Type'] = 'application/json'
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=Retry(
+        total=3,
+        connect=3,
+        read=2,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['GET', 'POST'],
+        respect_retry_after_header=True
+    )
+))
+
+# Dedicated keep-alive session for the Slack webhook, so notifications reuse
+# one TLS connection to hooks.slack.com instead of competing with API traffic
+SLACK_SESSION = requests.Session()
+SLACK_SESSION.headers.update({
+    'Content-Type': 'application/json',
+    'Connection': 'keep-alive'
+})
+SLACK_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=4,
+    max_retries=Retry(
+        total=3,
+        # Slack has usually accepted a post that timed out reading the reply,
+        # so only retry on error statuses to avoid duplicate notifications
+        read=0,
+        backoff_factor=1.0,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['POST']
+    )
+))
+
+# Long-lived worker pools for the per-org and per-member fan-out, shared by
+# every poll cycle so threads are not spun up and torn down each time
+ORG_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix='org')
+GITHUB_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix='github')
+
 # Global variable to cache the token
 cached_token = None
 token_expiry = None
 
+# File to persist the token so restarts and other workers can reuse it
+TOKEN_FILE = '.auth0_token.json'
+
+# Serializes token refreshes so concurrent callers don't each hit Auth0
+token_lock = threading.Lock()
+# Seconds to keep using a stale token after a failed refresh before retrying
+TOKEN_RETRY_DELAY = 30
+token_retry_at = 0
+
+# Validators and last bodies for conditional GETs, so unchanged responses
+# come back as 304 Not Modified without a body to download or parse
+orgs_validators = {}
+cached_orgs = []
+
+# GitHub ID -> {'html_url', 'etag', 'last_modified', 'fetched_at'}, shared by
+# the GitHub worker threads
+github_user_cache = {}
+github_cache_lock = threading.Lock()
+
+def conditional_headers(validators):
+    """Build If-None-Match / If-Modified-Since headers from stored validators"""
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+def response_validators(response):
+    """Extract ETag / Last-Modified validators from a response"""
+    return {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified')
+    }
+
+@functools.lru_cache(maxsize=1)
+def auth_headers(token):
+    """Build the (read-only) Authorization headers for an Auth0 token"""
+    return MappingProxyType({"Authorization": f"Bearer {token}"})
+
+def token_identity():
+    """Identify the Auth0 tenant and client a saved token was issued for"""
+    return {
+        'domain': AUTH0_DOMAIN,
+        'client_id': AUTH0_CLIENT_ID,
+        'audience': f'{AUTH0_API_BASE}/'
+    }
+
+def load_saved_token():
+    """Load the saved Auth0 token and its expiry timestamp from file"""
+    try:
+        with open(TOKEN_FILE, 'rb') as f:
+            data = orjson.loads(f.read())
+        # Ignore tokens issued for a different tenant, client or audience
+        if data.get('identity') != token_identity():
+            return None, 0
+        return data['t'], data['exp']
+    except FileNotFoundError:
+        return None, 0
+    except Exception as e:
+        print(f"Error loading saved Auth0 token: {e}")
+        return None, 0
+
+def save_token(token, expiry):
+    """Save the Auth0 token and its expiry timestamp to file, readable only by us"""
+    tmp_file = TOKEN_FILE + '.tmp'
+    try:
+        fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(orjson.dumps({'t': token, 'exp': expiry, 'identity': token_identity()}))
+        os.chmod(tmp_file, 0o600)
+        os.replace(tmp_file, TOKEN_FILE)
+    except Exception as e:
+        print(f"Error saving Auth0 token: {e}")
+
+def invalidate_auth0_token(token):
+    """Forget a token Auth0 rejected, in memory and on disk"""
+    global cached_token, token_expiry
+    
+    with token_lock:
+        if cached_token == token:
+            token_expiry = None
+            cached_token = None
+        saved_token, _ = load_saved_token()
+        if saved_token == token:
+            try:
+                os.remove(TOKEN_FILE)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Error removing saved Auth0 token: {e}")
+
 def get_auth0_token():
     """Get a fresh Auth0 Management API token using client credentials"""
-    global cached_token, token_expiry
+    global cached_token, token_expiry, token_retry_at
     
-    # If we have a cached token that's still valid, use it
-    if cached_token and token_expiry and datetime.now().timestamp() < token_expiry:
+    # If we have a cached token that's still valid, use it. The expiry is read
+    # before the token (and written after it) so this lock-free check never
+    # pairs a new expiry with an old token.
+    if token_expiry and datetime.now().timestamp() < token_expiry and cached_token:
         return cached_token
+    
+    with token_lock:
+        # Another thread may have refreshed the token while we waited
+        if token_expiry and datetime.now().timestamp() < token_expiry and cached_token:
+            return cached_token
         
-    try:
-        response = requests.post(f'https://{AUTH0_DOMAIN}/oauth/token', {
-            'client_id': AUTH0_CLIENT_ID,
-            'client_secret': AUTH0_CLIENT_SECRET,
-            'audience': f'https://{AUTH0_DOMAIN}/api/v2/',
-            'grant_type': 'client_credentials'
-        })
-        response.raise_for_status()
+        # After a failed refresh, keep serving the stale token for a while
+        if cached_token and datetime.now().timestamp() < token_retry_at:
+            return cached_token
         
-        token_data = response.json()
-        cached_token = token_data['access_token']
-        token_expiry = datetime.now().timestamp() + (token_data.get('expires_in', 3600) * 0.9)
+        # Reuse a token saved by a previous run or another worker
+        saved_token, saved_expiry = load_saved_token()
+        if saved_token and datetime.now().timestamp() < saved_expiry:
+            cached_token = saved_token
+            token_expiry = saved_expiry
+            return cached_token
         
-        return cached_token
-    except Exception as e:
-        print(f"Error getting Auth0 token: {e}")
+        try:
+            response = SESSION.post(f'https://{AUTH0_DOMAIN}/oauth/token', data=orjson.dumps({
+                'client_id': AUTH0_CLIENT_ID,
+                'client_secret': AUTH0_CLIENT_SECRET,
+                'audience': f'{AUTH0_API_BASE}/',
+                'grant_type': 'client_credentials'
+            }), timeout=DEFAULT_TIMEOUT)
+            response.raise_for_status()
+            
+            token_data = orjson.loads(response.content)
+            cached_token = token_data['access_token']
+            token_expiry = datetime.now().timestamp() + (token_data.get('expires_in', 3600) * 0.9)
+            save_token(cached_token, token_expiry)
+            
+            return cached_token
+        except Exception as e:
+            print(f"Error getting Auth0 token: {e}")
+            if not cached_token:
+                raise
+            token_retry_at = datetime.now().timestamp() + TOKEN_RETRY_DELAY
+            return cached_token
 
 
-def send_slack_message(message):
-    """Send a message to Slack"""
+def post_to_slack(payload):
+    """Post an encoded JSON payload to the Slack webhook"""
     if not SLACK_WEBHOOK_URL:
         print("Warning: SLACK_WEBHOOK_URL not set. Skipping Slack notification.")
         return
     
     try:
-        response = requests.post(
-            SLACK_WEBHOOK_URL,
-            json={"text": message},
-            headers={'Content-Type': 'application/json'}
-        )
+        response = SLACK_SESSION.post(SLACK_WEBHOOK_URL, data=payload, timeout=DEFAULT_TIMEOUT)
         response.raise_for_status()
     except Exception as e:
         print(f"Error sending Slack message: {e}")
 
+def send_slack_message(message):
+    """Send a message to Slack"""
+    post_to_slack(orjson.dumps({"text": message}))
+
+def split_slack_text(text):
+    """Split text on line boundaries into chunks that fit in a Slack section"""
+    chunks = []
+    current = ""
+    for line in text.split("\n"):
+        # A single line that can't fit on its own is truncated
+        if len(line) > SLACK_MAX_SECTION_CHARS:
+            line = line[:SLACK_MAX_SECTION_CHARS - 1] + "…"
+        if current and len(current) + 1 + len(line) > SLACK_MAX_SECTION_CHARS:
+            chunks.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    chunks.append(current)
+    return chunks
+
+def send_slack_batch(entries):
+    """Send (org, members) entries to Slack in as few messages as its limits allow"""
+    divider = {"type": "divider"}
+    divider_size = len(orjson.dumps(divider)) + 1
+    messages = []
+    blocks = []
+    size = 0
+    
+    def fits(block_count, block_size):
+        return (len(blocks) + block_count <= SLACK_MAX_BLOCKS
+                and size + block_size <= SLACK_MAX_PAYLOAD_BYTES - SLACK_PAYLOAD_OVERHEAD)
+    
+    for org, members in entries:
+        sections = [
+            {"type": "section", "text": {"type": "mrkdwn", "text": chunk}}
+            for chunk in split_slack_text(format_slack_message(org, members))
+        ]
+        section_sizes = [len(orjson.dumps(section)) + 1 for section in sections]
+        
+        # Start a new message rather than split an org across two
+        if blocks and not fits(len(sections) + 1, sum(section_sizes) + divider_size):
+            messages.append(blocks)
+            blocks, size = [], 0
+        
+        # An org too large for one message on its own is split section by section
+        for i, (section, section_size) in enumerate(zip(sections, section_sizes)):
+            if blocks and i == 0:
+                new_blocks, new_size = [divider, section], divider_size + section_size
+            else:
+                new_blocks, new_size = [section], section_size
+            if blocks and not fits(len(new_blocks), new_size):
+                messages.append(blocks)
+                blocks, size = [], 0
+                new_blocks, new_size = [section], section_size
+            blocks.extend(new_blocks)
+            size += new_size
+    
+    if blocks:
+        messages.append(blocks)
+    
+    for i, message_blocks in enumerate(messages):
+        text = f"{len(entries)} new organization(s) found"
+        if len(messages) > 1:
+            text += f" (part {i + 1} of {len(messages)})"
+        post_to_slack(orjson.dumps({"text": text, "blocks": message_blocks}))
+
 def load_previous_orgs():
-    """Load previously seen organizations from file"""
+    """Load the IDs of previously seen organizations from file
+
+    Returns None if the file exists but can't be read, so the caller can
+    reseed from the next poll instead of announcing every org as new.
+    """
     if os.path.exists(PREVIOUS_ORGS_FILE):
-        with open(PREVIOUS_ORGS_FILE, 'r') as f:
-            return json.load(f)
-    return []
+        try:
+            with open(PREVIOUS_ORGS_FILE, 'rb') as f:
+                # Older files stored full org objects rather than just IDs
+                return {org['id'] if isinstance(org, dict) else org for org in orjson.loads(f.read())}
+        except Exception as e:
+            print(f"Error loading previous organizations: {e}")
+            return None
+    return set()
 
-def save_previous_orgs(orgs):
-    """Save current organizations to file"""
-    with open(PREVIOUS_ORGS_FILE, 'w') as f:
-        json.dump(orgs, f)
+def save_previous_orgs(org_ids):
+    """Save the IDs of current organizations to file"""
+    # Write to a temp file and rename so a crash never leaves a partial file
+    tmp_file = PREVIOUS_ORGS_FILE + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(orjson.dumps(list(org_ids)))
+    os.replace(tmp_file, PREVIOUS_ORGS_FILE)
 
-def get_organizations():
+def load_github_user_cache():
+    """Load cached GitHub profile URLs from file"""
+    if os.path.exists(GITHUB_CACHE_FILE):
+        try:
+            with open(GITHUB_CACHE_FILE, 'rb') as f:
+                return orjson.loads(f.read())
+        except Exception as e:
+            print(f"Error loading GitHub user cache: {e}")
+    return {}
+
+def save_github_user_cache():
+    """Save cached GitHub profile URLs to file"""
+    with github_cache_lock:
+        data = orjson.dumps(github_user_cache)
+    # Per-process temp name so concurrent writers never share a partial file
+    tmp_file = f'{GITHUB_CACHE_FILE}.{os.getpid()}.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_file, GITHUB_CACHE_FILE)
+
+def get_organizations(token):
     """Get organizations with sorting by created_at in descending order"""
-    url = f"https://{AUTH0_DOMAIN}/api/v2/organizations"
+    global orgs_validators, cached_orgs
+    
+    url = f"{AUTH0_API_BASE}/organizations"
     headers = {
-        "Authorization": f"Bearer {get_auth0_token()}",
-        "Content-Type": "application/json"
+        **auth_headers(token),
+        **conditional_headers(orgs_validators)
     }
     params = {
         "sort": "created_at:-1"
     }
     
-    response = requests.get(url, headers=headers, params=params)
+    response = SESSION.get(url, headers=headers, params=params, timeout=DEFAULT_TIMEOUT)
+    if response.status_code == 304:
+        return cached_orgs
+    if response.status_code == 401:
+        invalidate_auth0_token(token)
     response.raise_for_status()
-    return response.json()
+    
+    cached_orgs = orjson.loads(response.content)
+    orgs_validators = response_validators(response)
+    return cached_orgs
 
-def get_github_user_info(github_id):
-    """Get GitHub user information from GitHub API."""
+def get_cached_github_profile_url(github_id):
+    """Return (is_fresh, entry) for a GitHub ID from the profile URL cache"""
+    with github_cache_lock:
+        entry = github_user_cache.get(github_id)
+    return bool(entry and time.time() - entry['fetched_at'] < GITHUB_CACHE_TTL), entry
+
+def cache_github_profile_url(github_id, entry):
+    """Store a GitHub profile URL cache entry, evicting the oldest when full"""
+    with github_cache_lock:
+        github_user_cache.pop(github_id, None)
+        github_user_cache[github_id] = entry
+        while len(github_user_cache) > GITHUB_CACHE_MAXSIZE:
+            del github_user_cache[next(iter(github_user_cache))]
+
+def get_github_profile_url(github_id):
+    """Get a GitHub user's profile URL, served from cache while fresh."""
+    is_fresh, entry = get_cached_github_profile_url(github_id)
+    if is_fresh:
+        return entry['html_url']
+    
     try:
-        response = requests.get(f"https://api.github.com/user/{github_id}")
-        if response.status_code == 200:
-            return response.json()
-        return None
+        # Revalidate a stale entry with a conditional GET
+        response = SESSION.get(
+            f"{GITHUB_API_BASE}/user/{github_id}",
+            headers={**GITHUB_HEADERS, **conditional_headers(entry or {})},
+            timeout=DEFAULT_TIMEOUT
+        )
+        if response.status_code == 304:
+            entry = {**entry, 'fetched_at': time.time()}
+        elif response.status_code == 200:
+            entry = {
+                'html_url': orjson.loads(response.content).get('html_url'),
+                **response_validators(response),
+                'fetched_at': time.time()
+            }
+        else:
+            return None
+        
+        cache_github_profile_url(github_id, entry)
+        return entry['html_url']
     except Exception as e:
         print(f"Error fetching GitHub user info: {e}")
         return None
 
+def fetch_github_profile_urls_graphql(github_ids):
+    """Fetch profile URLs for many GitHub users with batched GraphQL queries"""
+    urls = {}
+    for i in range(0, len(github_ids), GITHUB_GRAPHQL_BATCH_SIZE):
+        batch = github_ids[i:i + GITHUB_GRAPHQL_BATCH_SIZE]
+        # The numeric IDs Auth0 stores map to legacy GraphQL node IDs
+        node_ids = [base64.b64encode(f"04:User{github_id}".encode()).decode() for github_id in batch]
+        
+        response = SESSION.post(
+            f"{GITHUB_API_BASE}/graphql",
+            headers=GITHUB_HEADERS,
+            data=orjson.dumps({"query": GITHUB_USERS_QUERY, "variables": {"ids": node_ids}}),
+            timeout=DEFAULT_TIMEOUT
+        )
+        response.raise_for_status()
+        
+        # Unknown IDs come back as null nodes alongside an "errors" list, but
+        # a failed query (e.g. rate limited) has errors and no nodes at all
+        result = orjson.loads(response.content)
+        nodes = (result.get('data') or {}).get('nodes')
+        if nodes is None:
+            raise RuntimeError(f"GraphQL query failed: {result.get('errors')}")
+        for node in nodes:
+            if node and node.get('databaseId'):
+                github_id = str(node['databaseId'])
+                urls[github_id] = node.get('url')
+                cache_github_profile_url(github_id, {'html_url': node.get('url'), 'fetched_at': time.time()})
+    return urls
+
+def get_github_profile_urls(github_ids):
+    """Get profile URLs for a list of GitHub users, keyed by GitHub ID"""
+    urls = {}
+    missing = []
+    for github_id in dict.fromkeys(github_ids):
+        is_fresh, entry = get_cached_github_profile_url(github_id)
+        if is_fresh:
+            urls[github_id] = entry['html_url']
+        else:
+            missing.append(github_id)
+    
+    if not missing:
+        return urls
+    
+    # GraphQL needs a token but resolves every user in one round-trip
+    if GITHUB_TOKEN:
+        try:
+            urls.update(fetch_github_profile_urls_graphql(missing))
+            return urls
+        except Exception as e:
+            print(f"Error fetching GitHub users via GraphQL: {e}")
+    
+    # Otherwise look up GitHub users concurrently; the calls are pure I/O wait
+    urls.update(zip(missing, GITHUB_EXECUTOR.map(get_github_profile_url, missing)))
+    return urls
+
 def get_organization_members(org_id, token):
     """Get members of an organization."""
-    url = f"https://{AUTH0_DOMAIN}/api/v2/organizations/{org_id}/members"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
+    url = f"{AUTH0_API_BASE}/organizations/{org_id}/members"
     
     try:
-        response = requests.get(url, headers=headers)
+        response = SESSION.get(url, headers=auth_headers(token), timeout=DEFAULT_TIMEOUT)
         if response.status_code == 200:
-            members = response.json()
-            member_details = []
+            members = orjson.loads(response.content)
             
+            # Extract GitHub IDs from user_id (format: "github|123456")
+            github_ids = []
             for member in members:
-                # Extract GitHub ID from user_id (format: "github|123456")
                 user_id = member.get('user_id', '')
-                github_id = user_id.split('|')[-1] if 'github' in user_id else None
-                
-                # Get GitHub user info if we have a GitHub ID
-                github_info = None
-                if github_id:
-                    github_info = get_github_user_info(github_id)
-                
+                if user_id.startswith(GITHUB_USER_PREFIX):
+                    github_ids.append(user_id[len(GITHUB_USER_PREFIX):])
+                else:
+                    github_ids.append(None)
+            
+            github_urls = get_github_profile_urls([github_id for github_id in github_ids if github_id])
+            
+            member_details = []
+            for member, github_id in zip(members, github_ids):
                 member_details.append({
                     'name': member.get('name', 'Unknown'),
                     'email': member.get('email', 'No email'),
-                    'github_url': github_info.get('html_url') if github_info else None
+                    'github_url': github_urls.get(github_id) if github_id else None
                 })
             
             return member_details
         else:
+            if response.status_code == 401:
+                invalidate_auth0_token(token)
             print(f"Error getting members: {response.status_code}")
             return []
     except Exception as e:
         print(f"Error in get_organization_members: {e}")
         return []
 
-def find_new_organizations(current_orgs, previous_orgs):
-    """Find organizations that weren't in the previous list"""
-    previous_ids = {org['id'] for org in previous_orgs}
+def find_new_organizations(current_orgs, previous_ids):
+    """Find organizations whose IDs weren't in the previous set"""
     return [org for org in current_orgs if org['id'] not in previous_ids]
 
 def format_slack_message(org, members):
@@ -169,7 +576,11 @@ def format_slack_message(org, members):
     
     return "\n".join(message)
 
-def print_organization_details(org):
+def fetch_org_details(org, token):
+    """Fetch the members of an organization, returning (org, members)"""
+    return org, get_organization_members(org['id'], token)
+
+def print_organization_details(org, members):
     """Print details of a single organization"""
     print("\nNew Organization Found!")
     print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -177,58 +588,179 @@ def print_organization_details(org):
     print(f"Name: {org['name']}")
     print(f"Display Name: {org['display_name']}")
     
-    # Get and print member information
+    # Print member information
+    print("\nMembers:")
+    if members:
+        for member in members:
+            print(f"  - {member.get('name', 'Unknown')} ({member.get('email', 'No email')})")
+    else:
+        print("  No members found")
+    
+    print("-" * 50)
+
+# Lock file handle held by the process that runs the poller, and whether
+# this process is the poller
+poller_lock_file = None
+is_poller = False
+
+# Polling state, owned by the scheduler job
+scheduler = BackgroundScheduler()
+previous_ids = set()
+# Back-off interval from the last successful poll, and the interval the job
+# is currently scheduled at (which differs while retrying after an error)
+poll_interval = POLL_INTERVAL
+scheduled_interval = POLL_INTERVAL
+
+# Health state for /healthz; the start time stands in until the first poll
+process_start_ts = time.time()
+last_poll_ok_ts = process_start_ts
+last_new_count = 0
+last_error = None
+consecutive_failures = 0
+
+def poll_once():
+    """Run a single poll for new organizations, backing off while none appear"""
+    global previous_ids, poll_interval, scheduled_interval
+    global last_poll_ok_ts, last_new_count, last_error, consecutive_failures
+    
     try:
-        members = get_organization_members(org['id'], get_auth0_token())
-        print("\nMembers:")
-        if members:
-            for member in members:
-                print(f"  - {member.get('name', 'Unknown')} ({member.get('email', 'No email')})")
+        # Fetch the token once per cycle and share it across all requests
+        token = get_auth0_token()
+        current_orgs = get_organizations(token)
+        current_ids = {org['id'] for org in current_orgs}
+        
+        if previous_ids is None:
+            # The saved IDs were unreadable; treat the current orgs as already
+            # seen rather than notifying Slack about every one of them
+            print(f"\nSeeding previously seen organizations with {len(current_ids)} current organization(s)")
+            new_orgs = []
         else:
-            print("  No members found")
+            new_orgs = find_new_organizations(current_orgs, previous_ids)
+        
+        if new_orgs:
+            print(f"\nFound {len(new_orgs)} new organization(s)!")
+            # Fetch member details for all orgs concurrently, then print
+            # serially to keep output ordered and notify Slack in one post
+            org_details = list(ORG_EXECUTOR.map(
+                lambda org: fetch_org_details(org, token), new_orgs
+            ))
+            for org, members in org_details:
+                print_organization_details(org, members)
+            send_slack_batch(org_details)
+            interval = POLL_INTERVAL
+        else:
+            print(f"\nNo new organizations found at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            interval = min(poll_interval * 2, MAX_POLL_INTERVAL)
+        
+        # Save current organizations for next comparison, only if they changed
+        if current_ids != previous_ids:
+            save_previous_orgs(current_ids)
+            previous_ids = current_ids
+        
+        poll_interval = interval
+        last_poll_ok_ts = time.time()
+        last_new_count = len(new_orgs)
+        last_error = None
+        consecutive_failures = 0
         
-        # Send to Slack
-        slack_message = format_slack_message(org, members)
-        send_slack_message(slack_message)
+        print(f"\nWaiting {interval} seconds before next check...")
     except Exception as e:
-        print(f"  Error fetching members: {e}")
+        last_error = str(e)
+        consecutive_failures += 1
+        print(f"Error occurred: {e}")
+        print(f"Retrying in {ERROR_RETRY_INTERVAL} seconds...")
+        # Leave poll_interval alone so the back-off resumes after the retry
+        interval = ERROR_RETRY_INTERVAL
     
-    print("-" * 50)
+    write_heartbeat()
+    
+    # Only touch the schedule when the interval actually changes
+    if interval != scheduled_interval:
+        scheduled_interval = interval
+        scheduler.reschedule_job('poll', trigger='interval', seconds=interval)
+
+def poller_health():
+    """Snapshot this process's polling state for /healthz and the heartbeat"""
+    return {
+        "last": last_poll_ok_ts,
+        "interval": poll_interval,
+        "last_new_count": last_new_count,
+        "last_error": last_error,
+        "consecutive_failures": consecutive_failures,
+        "pid": os.getpid()
+    }
+
+def write_heartbeat():
+    """Share the poller's health with the other workers via HEARTBEAT_FILE"""
+    tmp_file = f'{HEARTBEAT_FILE}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(poller_health()))
+        os.replace(tmp_file, HEARTBEAT_FILE)
+    except Exception as e:
+        print(f"Error writing poller heartbeat: {e}")
+
+def read_heartbeat():
+    """Read the poller's last heartbeat, or None if there isn't a readable one"""
+    try:
+        with open(HEARTBEAT_FILE, 'rb') as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error reading poller heartbeat: {e}")
+        return None
 
-def poll_organizations():
-    """Poll for new organizations every minute"""
+def acquire_poller_lock():
+    """Try to become the single poller process, returning True on success"""
+    global poller_lock_file
+    
+    if fcntl is None:
+        return True
+    
+    lock_file = open(POLLER_LOCK_FILE, 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    # Keep the file open for the life of the process to hold the lock
+    poller_lock_file = lock_file
+    return True
+
+def start_polling():
+    """Schedule polling for new organizations in this process"""
+    global previous_ids, is_poller, last_poll_ok_ts
+    
     print("Starting organization polling system...")
-    print("Checking for new organizations every minute")
+    print(f"Checking for new organizations every {POLL_INTERVAL} to {MAX_POLL_INTERVAL} seconds")
     print("Press Ctrl+C to stop")
     
-    while True:
-        try:
-            current_orgs = get_organizations()
-            previous_orgs = load_previous_orgs()
-            
-            new_orgs = find_new_organizations(current_orgs, previous_orgs)
-            
-            if new_orgs:
-                print(f"\nFound {len(new_orgs)} new organization(s)!")
-                for org in new_orgs:
-                    print_organization_details(org)
-            else:
-                print(f"\nNo new organizations found at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            
-            # Save current organizations for next comparison
-            save_previous_orgs(current_orgs)
-            
-            # Wait for 1 minute before next check
-            print("\nWaiting 1 minute before next check...")
-            time.sleep(60)  # 1 minute in seconds
-            
-        except KeyboardInterrupt:
-            print("\nPolling stopped by user")
-            break
-        except Exception as e:
-            print(f"Error occurred: {e}")
-            print("Retrying in 5 minutes...")
-            time.sleep(5 * 60)  # 5 minutes in seconds
+    # Load previously seen org IDs once and keep them in memory
+    previous_ids = load_previous_orgs()
+    
+    # Only the poller uses the GitHub cache, so only it warms the cache from
+    # the last run and writes it back on shutdown
+    github_user_cache.update(load_github_user_cache())
+    atexit.register(save_github_user_cache)
+    
+    # max_instances=1 stops a slow poll from overlapping the next one and
+    # coalesce=True collapses any missed runs into one
+    scheduler.add_job(
+        poll_once, 'interval', seconds=POLL_INTERVAL, id='poll',
+        max_instances=1, coalesce=True, next_run_time=datetime.now()
+    )
+    # Polling starts now, possibly long after this worker booted on takeover
+    last_poll_ok_ts = time.time()
+    is_poller = True
+    write_heartbeat()
+
+def try_become_poller():
+    """Take over polling if the poller process has exited and released its lock"""
+    if acquire_poller_lock():
+        scheduler.remove_job('acquire_poller_lock')
+        print("Acquired the poller lock; taking over polling in this worker")
+        start_polling()
 
 # Create a Flask app for gunicorn
 from flask import Flask
@@ -238,12 +770,47 @@ app = Flask(__name__)
 def index():
     return "Auth0 Organization Monitor is running"
 
-# Start the polling in a separate thread
-def start_polling():
-    poll_organizations()
+@app.route('/healthz')
+def healthz():
+    """Report polling health; 503 once the last successful poll is too old"""
+    # Other workers report the poller's health from its heartbeat file, so a
+    # probe reaching any worker sees a stalled or dead poller. Until a first
+    # heartbeat appears, this process's start time stands in for it.
+    if is_poller:
+        state = poller_health()
+    else:
+        state = read_heartbeat() or {"last": process_start_ts, "interval": POLL_INTERVAL}
+    
+    # Health is staleness only: a single upstream error shouldn't get the
+    # worker restarted (and its in-memory state dropped), so the threshold
+    # leaves room for one error retry after the last successful interval.
+    # last_error and consecutive_failures are reported for information.
+    age = time.time() - state["last"]
+    ok = age <= state["interval"] + ERROR_RETRY_INTERVAL + HEALTHZ_GRACE_PERIOD
+    if is_poller:
+        ok = ok and scheduler.running
+    body = {
+        "ok": ok,
+        "poller": is_poller,
+        **state,
+        "age": round(age, 1)
+    }
+    return orjson.dumps(body), 200 if ok else 503, {'Content-Type': 'application/json'}
 
-# Start the polling thread when the app is ready
-threading.Thread(target=start_polling, daemon=True).start()
+# Start polling when the app is ready, in only one process per host so
+# multiple gunicorn workers don't each poll and notify
+if RUN_POLLER:
+    if acquire_poller_lock():
+        start_polling()
+    else:
+        # Keep retrying the lock so a sibling takes over if the poller exits
+        print("Another process holds the poller lock; not polling in this worker")
+        scheduler.add_job(
+            try_become_poller, 'interval', seconds=POLL_INTERVAL, id='acquire_poller_lock',
+            max_instances=1, coalesce=True
+        )
+    scheduler.start()
+    atexit.register(scheduler.shutdown)
 
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 8000))) 
\ No newline at end of file
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 8000)))